@@ -1,4 +1,5 @@
-from mesh_tool import *  
+from mesh_tool import create_3d_mesh, write_ansys_mesh
+import numpy as np
 
 # dimensions of box (m)
 width = 10 # X axis
@@ -17,47 +18,102 @@ mesh = create_3d_mesh(nx, ny, nz, width, height, depth)
 t = 2*width/nx  # needs to match the discretization 
 print('Thickness of Tv Support t: ',t)
 
-# define regions
-for e in mesh.elements:
-  x, y, z = mesh.calc_barycenter(e)
+# region codes of the elements, the names are only looked up when the mesh is written
+MECH, SOLID, VOID = 0, 1, 2
+region_names = ['mech', 'solid', 'void']
 
-  if 4 < x < 6 and 0 < y < 8 and 0 < z < 0.25:
-    e.region = 'solid'
-  if (0 < x < 4 or 6 < x < 10) and 0 < y < 8 and 0 < z < 0.25:
-    e.region = 'void'
+# z ranges of the wall plate at the back and of the tv mounting plate at the front,
+# shared by the element regions and the boundary condition node sets
+wall_z = (0, 0.25)
+tv_z = (5.75, 6)
 
-  if (((1 < x < 3 or 7 < x < 9) and 0 < y < 8) or ((3 < x < 7 and (0 < y < 3 or 5 < y < 8)))) and 5.75 < z < 6 or (3 < x < 7 and 3 < y < 5 and 5.75 < z < 6):
-    e.region = 'solid'
+r = 0.2  # radius of the cylinder
+r2 = r**2
 
-  if ((3 < x < 7 and 0 < y < 3) or 
-    (3 < x < 7 and 5 < y < 8) or 
-    (0 < x < 1 and 0 < y < 8) or 
-    (9 < x < 10 and 0 < y < 8)) and 5.75 < z < 6:
-    e.region = 'void'
-    
-# default region is 'mech'
-    
-# define node set for "surface" load    
-back_support = []
-force_1 = []
-force_2 = []
-force_3 = []
-force_4 = []
+centers = np.array([(2, 2), (8, 2), (2, 6), (8, 6)], dtype=float)  # centers of the cylinders as (n_centers, 2) array
 
-r = 0.2  # radius of the cylinder
+def inside(v, lo, hi):
+  # open interval lo < v < hi, elementwise
+  return (lo < v) & (v < hi)
+
+def classify_all(mesh, nx, ny, nz):
+  # regions of the elements and boundary condition node sets in one pass over the grid.
+  # create_3d_mesh numbers elements and nodes x fastest, then y, then z, so both are handled with the same
+  # broadcastable (y,x) plane axes and a z axis: a (ny,nx) plane of a z layer k starts at element k*nx*ny,
+  # a (ny+1,nx+1) node plane at node k*(nx+1)*(ny+1).
+  # returns the region codes of the elements as flat uint8 array, the back_support node indices and the four force node index arrays
+
+  # on the grid the barycenter of element (i,j,k) is (x[i], y[j], z[k]). The axes are taken with calc_barycenter from
+  # one row of elements per axis, such that barycenters on a strict plate bound (e.g. z=0.25) round exactly as
+  # the mesh computes them. This needs only nx+ny+nz calls instead of one per element
+  x = np.array([mesh.calc_barycenter(mesh.elements[i])[0] for i in range(nx)])[np.newaxis, :]
+  y = np.array([mesh.calc_barycenter(mesh.elements[j*nx])[1] for j in range(ny)])[:, np.newaxis]
+  z = np.array([mesh.calc_barycenter(mesh.elements[k*nx*ny])[2] for k in range(nz)])
+
+  region = np.full((nz, ny, nx), MECH, dtype=np.uint8)
+
+  # each plate is a z slab whose regions only depend on (x,y): the (ny,nx) plane is classified once
+  # into a lookup table which is copied into all element layers of the slab
+  def plate(layers, solid, void):
+    lut = np.full((ny, nx), MECH, dtype=np.uint8)
+    lut[solid] = SOLID
+    lut[void] = VOID  # void wins where it overlaps solid
+    k = np.flatnonzero(layers)
+    region[k] = np.where(lut != MECH, lut, region[k])
+
+  # wall plate at the back
+  plate(inside(z, *wall_z),
+        inside(x, 4, 6) & inside(y, 0, 8),
+        (inside(x, 0, 4) | inside(x, 6, 10)) & inside(y, 0, 8))
+
+  # tv mounting plate at the front
+  plate(inside(z, *tv_z),
+        ((inside(x, 1, 3) | inside(x, 7, 9)) & inside(y, 0, 8)) | (inside(x, 3, 7) & (inside(y, 0, 3) | inside(y, 5, 8))) | (inside(x, 3, 7) & inside(y, 3, 5)),
+        (inside(x, 3, 7) & inside(y, 0, 3)) |
+        (inside(x, 3, 7) & inside(y, 5, 8)) |
+        (inside(x, 0, 1) & inside(y, 0, 8)) |
+        (inside(x, 9, 10) & inside(y, 0, 8)))
+
+  # like the barycenter axes, the node axes are taken from the mesh itself, so the strict bounds of the node sets
+  # see the same coordinates as a per node test on mesh.nodes would. On the grid the nodes are fully described
+  # by these three axes, only the rows along them are read from mesh.nodes (array or list of coordinates)
+  # instead of converting all nodes
+  x = np.asarray(mesh.nodes[:nx+1], dtype=float)[:, 0][np.newaxis, :]
+  y = np.asarray(mesh.nodes[:(nx+1)*(ny+1):nx+1], dtype=float)[:, 1][:, np.newaxis]
+  z = np.asarray(mesh.nodes[::(nx+1)*(ny+1)], dtype=float)[:, 2]
+
+  # back_support is a box of nodes: the intersection of the index tiles of the three axes, no node is tested
+  i = np.flatnonzero(inside(x, 4, 6))
+  j = np.flatnonzero(inside(y, 0, 8))
+  k = np.flatnonzero(inside(z, *wall_z))
+  back = (k[:, np.newaxis, np.newaxis] * ((nx+1)*(ny+1)) + j[np.newaxis, :, np.newaxis] * (nx+1) + i).ravel()
+
+  # the force sets are a (y,x) shape within a thin z slab. Only the nodes of the slab layers are claimed,
+  # the full (nz+1,ny+1,nx+1) node mask is never built.
+  def slab_nodes(layers, plane):
+    return (np.flatnonzero(layers)[:, np.newaxis] * plane.size + np.flatnonzero(plane)).ravel()
+
+  # one force set per cylinder: the nodes of the tv plate within radius r of its center.
+  # the distances to all centers are evaluated at once on a (n_centers,ny+1,nx+1) stack of node planes
+  cx = centers[:, 0, np.newaxis, np.newaxis]
+  cy = centers[:, 1, np.newaxis, np.newaxis]
+  cylinders = (x - cx)**2 + (y - cy)**2 <= r2
+  surface = inside(z, *tv_z)
+  force = [slab_nodes(surface, plane) for plane in cylinders]
 
-centers = [(2, 2), (8, 2), (2, 6), (8, 6)]  # centers of the cylinders
+  return region.ravel(), back, force
 
-force_sets = [force_1, force_2, force_3, force_4]  # list of force sets
+# define regions and node set for "surface" load
+region, back, force = classify_all(mesh, nx, ny, nz)
 
-for i, n in enumerate(mesh.nodes):
-    x, y, z = n
-    for j, (h, k) in enumerate(centers):
-        if ((x - h)**2 + (y - k)**2 <= r**2) and 5.75 < z < 6:
-            force_sets[j].append(i)
+# default region is 'mech', write_ansys_mesh expects the region names on the elements.
+# MECH is 0, so the other elements are found directly on the codes without a temporary mask
+for i in np.flatnonzero(region):
+  mesh.elements[i].region = region_names[region[i]]
 
-    if 4 < x < 6 and 0 < y < 8 and 0 < z < 0.25:
-      back_support.append(i)
+# the node sets stay packed index arrays, mesh.bc only needs them iterable
+back_support = back.astype(np.int32)
+force_1, force_2, force_3, force_4 = [f.astype(np.int32) for f in force]
 
 mesh.bc.append(('back_support', back_support))
 mesh.bc.append(('force_1', force_1))